@@ -0,0 +1,209 @@
+import argparse
+import json
+import platform
+import random
+import tempfile
+import time
+import tkinter
+
+import numpy as np
+
+from part15 import World, CanvasRenderer, create_ranking, replay
+
+
+SIZES = [10, 100, 1000, 10000]
+
+
+def populate(world: World, count: int, rng: np.random.Generator):
+    for x, y in zip(rng.uniform(0, world.width - 20, count), rng.uniform(0, world.height / 2, count)):
+        world.enemies.spawn(x, y)
+    for x, y in zip(rng.uniform(0, world.width - 2, count), rng.uniform(world.height / 2, world.height, count)):
+        world.shots.spawn(x, y)
+
+
+def bench_world(count: int, ticks: int, seed: int, render: bool = False, batch: bool = True) -> dict:
+    random.seed(seed)
+    world = World(2000, 2000, seed=seed, waves=[])
+    world.max_reached_bottom = float("inf")
+    populate(world, count, np.random.default_rng(seed))
+
+    if render:
+        root = tkinter.Tk()
+        canvas = tkinter.Canvas(root, width=world.width, height=world.height)
+        canvas.pack()
+        renderer = CanvasRenderer(canvas, world, batch=batch)
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(ticks):
+        tick_start = time.perf_counter()
+        world.step()
+        if render:
+            renderer.sync()
+            canvas.update_idletasks()
+        latencies.append(time.perf_counter() - tick_start)
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist()
+    result = {
+        "entities": count,
+        "ticks": ticks,
+        "ticks_per_sec": ticks / elapsed,
+        "tick_p50_ms": p50 * 1000,
+        "tick_p95_ms": p95 * 1000,
+        "tick_p99_ms": p99 * 1000,
+        "score": world.score,
+        "enemies_left": len(world.enemies),
+        "shots_left": len(world.shots),
+    }
+
+    if render:
+        result["tcl"] = renderer.commands.stats()
+        root.destroy()
+    return result
+
+
+def bench_ranking(rows: int, reads: int, seed: int, backend: str) -> dict:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        ranking = create_ranking(backend, tmp)
+
+        start = time.perf_counter()
+        for _ in range(rows):
+            ranking.write(rng.randrange(0, 1000))
+        write_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(reads):
+            ranking.get_rank()
+        read_elapsed = time.perf_counter() - start
+
+        if hasattr(ranking, "close"):
+            ranking.close()
+
+    return {
+        "backend": backend,
+        "rows": rows,
+        "reads": reads,
+        "writes_per_sec": rows / write_elapsed,
+        "reads_per_sec": reads / read_elapsed,
+    }
+
+
+def bench_replay(path: str) -> dict:
+    with open(path, "rb") as f:
+        data = f.read()
+
+    start = time.perf_counter()
+    world = replay(data)
+    elapsed = time.perf_counter() - start
+    return {
+        "path": path,
+        "ticks": world.tick_count,
+        "ticks_per_sec": world.tick_count / elapsed,
+        "score": world.score,
+    }
+
+
+SETTINGS = ("seed", "ticks", "render", "batch")
+RANKING_SETTINGS = ("backend", "rows", "reads")
+
+
+def mismatched_settings(results: dict, baseline: dict) -> list:
+    mismatches = [
+        f"{key}: {baseline.get(key)!r} -> {results.get(key)!r}"
+        for key in SETTINGS if baseline.get(key) != results.get(key)
+    ]
+    base_ranking = baseline.get("ranking", {})
+    mismatches.extend(
+        f"ranking {key}: {base_ranking.get(key)!r} -> {results['ranking'].get(key)!r}"
+        for key in RANKING_SETTINGS if base_ranking.get(key) != results["ranking"].get(key)
+    )
+    return mismatches
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    base_worlds = {r["entities"]: r for r in baseline.get("world", [])}
+    for r in results["world"]:
+        base = base_worlds.get(r["entities"])
+        if base and r["ticks_per_sec"] < base["ticks_per_sec"] * (1 - tolerance):
+            regressions.append(f"world {r['entities']}: ticks/sec {base['ticks_per_sec']:.1f} -> {r['ticks_per_sec']:.1f}")
+
+    base_replays = {r["path"]: r for r in baseline.get("replay", [])}
+    for r in results.get("replay", []):
+        base = base_replays.get(r["path"])
+        if base and r["ticks_per_sec"] < base["ticks_per_sec"] * (1 - tolerance):
+            regressions.append(f"replay {r['path']}: ticks/sec {base['ticks_per_sec']:.1f} -> {r['ticks_per_sec']:.1f}")
+
+    base_ranking = baseline.get("ranking")
+    if base_ranking:
+        for key in ("writes_per_sec", "reads_per_sec"):
+            if results["ranking"][key] < base_ranking[key] * (1 - tolerance):
+                regressions.append(f"ranking {key}: {base_ranking[key]:.1f} -> {results['ranking'][key]:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="シューティングゲームのベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="敵・弾の数")
+    parser.add_argument("--ticks", type=int, default=100, help="計測するティック数")
+    parser.add_argument("--ranking-rows", type=int, default=10000, help="ランキングに書き込む件数")
+    parser.add_argument("--ranking-reads", type=int, default=20, help="ランキングを読み込む回数")
+    parser.add_argument("--ranking-backend", choices=["file", "sqlite"], default="file", help="ランキングの保存方式")
+    parser.add_argument("--render", action="store_true", help="Canvasへの描画も計測する（要ディスプレイ、Xvfb可）")
+    parser.add_argument("--no-batch", action="store_true", help="Tclコマンドをまとめずに1件ずつ送る")
+    parser.add_argument("--replay", nargs="+", default=[], help="再生して計測するリプレイファイル")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("--output", default="bench_result.json", help="結果の出力先")
+    parser.add_argument("--baseline", help="比較するベースラインの結果ファイル")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="許容する性能低下の割合")
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "ticks": args.ticks,
+        "render": args.render,
+        "batch": not args.no_batch,
+        "world": [],
+    }
+    for count in args.sizes:
+        result = bench_world(count, args.ticks, args.seed, args.render, not args.no_batch)
+        results["world"].append(result)
+        print(f"{count:>6} entities: {result['ticks_per_sec']:10.1f} ticks/sec  "
+              f"p50 {result['tick_p50_ms']:.3f} ms  p99 {result['tick_p99_ms']:.3f} ms")
+
+    results["replay"] = []
+    for path in args.replay:
+        result = bench_replay(path)
+        results["replay"].append(result)
+        print(f"replay {path}: {result['ticks_per_sec']:10.1f} ticks/sec  score {result['score']}")
+
+    results["ranking"] = bench_ranking(args.ranking_rows, args.ranking_reads, args.seed, args.ranking_backend)
+    print(f"ranking: {results['ranking']['writes_per_sec']:.1f} writes/sec  "
+          f"{results['ranking']['reads_per_sec']:.1f} reads/sec")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+        # 条件が違う結果どうしを比べても性能の変化は分からないので、比較しない
+        mismatches = mismatched_settings(results, baseline)
+        if mismatches:
+            for mismatch in mismatches:
+                print(f"SETTINGS MISMATCH {mismatch}")
+            raise SystemExit("ベースラインと計測条件が違うため比較できません")
+
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,1011 @@
 import tkinter
 import random
+import time
 import datetime
 import csv
+import json
+import contextlib
+import collections
+import heapq
+import os
+import struct
+import sqlite3
 
-import ctypes
-ctypes.windll.shcore.SetProcessDpiAwareness(1)
+import numpy as np
+
+
+NULL_PHASE = contextlib.nullcontext()
 
 
 class Shot:
-    def __init__(self, field: tkinter.Canvas, x: int, y: int) -> None:
-        shot_length = 5
-        self.id = field.create_line(x, y, x, y + shot_length, width=3)
-        self.field = field
+    width = 2
+    height = 5
+    vx = 0
+    vy = -5
+    point = 0
+
+
+class Enemy:
+    width = 20
+    height = 20
+    vx = 0
+    vy = 5
+    point = 1
+
+
+class EntityStore:
+    def __init__(self, kind, capacity: int = 64) -> None:
+        self.kind = kind
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.px = np.zeros(capacity)
+        self.py = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.point = np.zeros(capacity, dtype=np.int64)
+        self.serial = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+        self.size = 0
+        self.count = 0
+        self.free = []
+        self.next_serial = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def spawn(self, x: float, y: float, vx: float = None, vy: float = None, point: int = None) -> int:
+        if self.free:
+            self.hits += 1
+            i = self.free.pop()
+        else:
+            self.misses += 1
+            if self.size == len(self.alive):
+                self._grow()
+            i = self.size
+            self.size += 1
+
+        self.x[i] = self.px[i] = x
+        self.y[i] = self.py[i] = y
+        self.vx[i] = self.kind.vx if vx is None else vx
+        self.vy[i] = self.kind.vy if vy is None else vy
+        self.point[i] = self.kind.point if point is None else point
+        self.serial[i] = self.next_serial
+        self.alive[i] = True
+
+        self.next_serial += 1
+        self.count += 1
+        return i
+
+    def remove(self, indices):
+        indices = np.atleast_1d(indices)
+        indices = indices[self.alive[indices]]
+        self.alive[indices] = False
+        self.free.extend(indices.tolist())
+        self.count -= len(indices)
+
+    def clear(self):
+        self.alive[:] = False
+        self.size = 0
+        self.count = 0
+        self.free = []
 
     def move(self):
-        self.field.move(self.id, 0, -5)
-    
-    def check_overlap(self) -> tuple:
-        x1, y1, x2, y2 = self.field.bbox(self.id)
-        overlap_ids = self.field.find_overlapping(x1, y1, x2, y2)
+        n = self.size
+        self.px[:n] = self.x[:n]
+        self.py[:n] = self.y[:n]
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
 
-        return overlap_ids
+    def bounce(self, x1, x2):
+        n = self.size
+        x, vx = self.x[:n], self.vx[:n]
+        left = x < x1
+        right = x + self.kind.width > x2
+        x[left] = x1
+        x[right] = x2 - self.kind.width
+        vx[left] = np.abs(vx[left])
+        vx[right] = -np.abs(vx[right])
 
+    def indices(self) -> np.ndarray:
+        return np.flatnonzero(self.alive[:self.size])
 
-class Player:
-    def __init__(self, field: tkinter.Canvas) -> None:
-        self.id = field.create_rectangle(100, 100, 110, 110, fill="black")
+    def find_below(self, height) -> np.ndarray:
+        n = self.size
+        return np.flatnonzero(self.alive[:n] & (self.y[:n] > height))
+
+    def find_outside(self, x1, y1, x2, y2) -> np.ndarray:
+        n = self.size
+        x, y = self.x[:n], self.y[:n]
+        outside = (x + self.kind.width < x1) | (x > x2) | (y + self.kind.height < y1) | (y > y2)
+        return np.flatnonzero(self.alive[:n] & outside)
+
+    def bbox(self, i) -> tuple:
+        x, y = float(self.x[i]), float(self.y[i])
+        return x, y, x + self.kind.width, y + self.kind.height
+
+    def bboxes(self, indices, alpha: float = 1.0) -> tuple:
+        if alpha == 1.0:
+            x1 = self.x[indices]
+            y1 = self.y[indices]
+        else:
+            px = self.px[indices]
+            py = self.py[indices]
+            x1 = px + (self.x[indices] - px) * alpha
+            y1 = py + (self.y[indices] - py) * alpha
+        return x1, y1, x1 + self.kind.width, y1 + self.kind.height
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "free": len(self.free),
+            "capacity": len(self.alive),
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
+
+    def _grow(self):
+        capacity = len(self.alive) * 2
+        for name in ("x", "y", "px", "py", "vx", "vy", "point", "serial", "alive"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+
+class Broadphase:
+    def update(self, store: EntityStore):
+        raise NotImplementedError
+
+    def query(self, x1, y1, x2, y2) -> list:
+        raise NotImplementedError
+
+
+class BruteForce(Broadphase):
+    def update(self, store: EntityStore):
+        self.store = store
+
+    def query(self, x1, y1, x2, y2) -> list:
+        indices = self.store.indices()
+        ex1, ey1, ex2, ey2 = self.store.bboxes(indices)
+        return indices[(x1 <= ex2) & (ex1 <= x2) & (y1 <= ey2) & (ey1 <= y2)].tolist()
+
+
+class UniformGrid(Broadphase):
+    def __init__(self, cell_size: int = 32) -> None:
+        self.cell_size = cell_size
+        self.cells = {}
+        self.record = np.zeros((0, 5), dtype=np.int64)
+        self.linked = np.zeros(0, dtype=bool)
+
+    def update(self, store: EntityStore):
+        capacity = len(store.alive)
+        if len(self.linked) < capacity:
+            record = np.zeros((capacity, 5), dtype=np.int64)
+            record[:len(self.record)] = self.record
+            linked = np.zeros(capacity, dtype=bool)
+            linked[:len(self.linked)] = self.linked
+            self.record, self.linked = record, linked
+
+        for i in np.flatnonzero(self.linked & ~store.alive).tolist():
+            self._unlink(i)
+
+        indices = store.indices()
+        x1, y1, x2, y2 = store.bboxes(indices)
+        ranges = np.column_stack((
+            store.serial[indices],
+            x1 // self.cell_size, y1 // self.cell_size,
+            x2 // self.cell_size, y2 // self.cell_size,
+            )).astype(np.int64)
+
+        changed = ~self.linked[indices] | np.any(self.record[indices] != ranges, axis=1)
+        for i, entry in zip(indices[changed].tolist(), ranges[changed]):
+            if self.linked[i]:
+                self._unlink(i)
+            self._link(i, entry)
+
+    def query(self, x1, y1, x2, y2) -> list:
+        found = set()
+        for cx in range(int(x1 // self.cell_size), int(x2 // self.cell_size) + 1):
+            for cy in range(int(y1 // self.cell_size), int(y2 // self.cell_size) + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    found |= cell
+        return sorted(found)
+
+    def _cells_of(self, i):
+        _, cx1, cy1, cx2, cy2 = self.record[i].tolist()
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                yield cx, cy
+
+    def _link(self, i, entry):
+        self.record[i] = entry
+        self.linked[i] = True
+        for key in self._cells_of(i):
+            self.cells.setdefault(key, set()).add(i)
+
+    def _unlink(self, i):
+        for key in self._cells_of(i):
+            cell = self.cells[key]
+            cell.discard(i)
+            if not cell:
+                del self.cells[key]
+        self.linked[i] = False
+
+
+class SweepAndPrune(Broadphase):
+    def update(self, store: EntityStore):
+        indices = store.indices()
+        x1 = store.x[indices]
+        order = np.argsort(x1, kind="stable")
+        self.indices = indices[order]
+        self.x1 = x1[order]
+        self.max_width = store.kind.width
+
+    def query(self, x1, y1, x2, y2) -> list:
+        lo = np.searchsorted(self.x1, x1 - self.max_width, side="left")
+        hi = np.searchsorted(self.x1, x2, side="right")
+        return sorted(self.indices[lo:hi].tolist())
+
+
+class FrameProfiler:
+    def __init__(self, history: int = 300, trace_length: int = 10000) -> None:
+        self.history = history
+        self.samples = {}
+        self.current = {}
+        self.trace = collections.deque(maxlen=trace_length)
+        self.frame_count = 0
+        self.tcl_calls = 0
+        self.gauges = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current[name] = self.current.get(name, 0.0) + time.perf_counter() - start
+
+    def gauge(self, name: str, value):
+        self.gauges[name] = value
+
+    def attach(self, field: tkinter.Canvas):
+        field.tk = TclCallCounter(field.tk, self)
+
+    def end_frame(self, steps: int = 1):
+        record = {"frame": self.frame_count, "steps": steps, "tcl_calls": self.tcl_calls}
+        record.update(self.gauges)
+        for name, seconds in self.current.items():
+            self.samples.setdefault(name, collections.deque(maxlen=self.history)).append(seconds)
+            record[name] = seconds
+        self.samples.setdefault("tcl_calls", collections.deque(maxlen=self.history)).append(self.tcl_calls)
+        self.trace.append(record)
+
+        self.frame_count += 1
+        self.current = {}
+        self.tcl_calls = 0
+
+    def percentiles(self, name: str) -> tuple:
+        samples = self.samples.get(name)
+        if not samples:
+            return 0.0, 0.0, 0.0
+        return tuple(np.percentile(samples, [50, 95, 99]).tolist())
+
+    def report(self) -> dict:
+        return {name: dict(zip(("p50", "p95", "p99"), self.percentiles(name))) for name in self.samples}
+
+    def dump(self, path: str):
+        if path.endswith(".csv"):
+            names = sorted({name for record in self.trace for name in record} - {"frame", "steps", "tcl_calls"})
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=["frame", "steps", "tcl_calls"] + names, restval=0.0)
+                writer.writeheader()
+                writer.writerows(self.trace)
+        else:
+            with open(path, "w") as f:
+                json.dump({"summary": self.report(), "frames": list(self.trace)}, f, indent=2)
+
+
+class NullProfiler(FrameProfiler):
+    def phase(self, name: str):
+        return NULL_PHASE
+
+    def gauge(self, name: str, value):
+        pass
+
+    def end_frame(self, steps: int = 1):
+        pass
+
+
+class TclCallCounter:
+    def __init__(self, tk, profiler: FrameProfiler) -> None:
+        self._tk = tk
+        self.profiler = profiler
+
+    def call(self, *args):
+        self.profiler.tcl_calls += 1
+        return self._tk.call(*args)
+
+    def eval(self, script):
+        self.profiler.tcl_calls += 1
+        return self._tk.eval(script)
+
+    def __getattr__(self, name):
+        return getattr(self._tk, name)
+
+
+class ProfilerOverlay:
+    def __init__(self, field: tkinter.Canvas, profiler: FrameProfiler, interval: int = 30) -> None:
         self.field = field
+        self.profiler = profiler
+        self.interval = interval
+        self.visible = False
+        self.text = self.field.create_text(10, 30, text="", fill="black", anchor="nw", font=("Courier", 8),
+                                           state="hidden")
+
+    def toggle(self, event=None):
+        self.visible = not self.visible
+        self.field.itemconfigure(self.text, state="normal" if self.visible else "hidden")
+        self.draw()
+
+    def draw(self):
+        lines = ["phase           p50     p95     p99 (ms)"]
+        for name in sorted(self.profiler.samples):
+            if name == "tcl_calls":
+                continue
+            p50, p95, p99 = self.profiler.percentiles(name)
+            lines.append(f"{name:<12}{p50 * 1000:8.2f}{p95 * 1000:8.2f}{p99 * 1000:8.2f}")
+        p50, p95, p99 = self.profiler.percentiles("tcl_calls")
+        lines.append(f"{'tcl calls':<12}{p50:8.0f}{p95:8.0f}{p99:8.0f}")
+        lines.append(" ".join(f"{name} {value}" for name, value in self.profiler.gauges.items()))
+        self.field.itemconfigure(self.text, text="\n".join(lines))
+        self.field.tag_raise(self.text)
+
+    def update(self):
+        if self.visible and self.profiler.frame_count % self.interval == 0:
+            self.draw()
+
+
+class Viewport:
+    spawn_margin = 50
+
+    def __init__(self, width: int, height: int) -> None:
+        self.base_width = width
+        self.base_height = height
+        self.width = width
+        self.height = height
+        self.resizes = 0
+
+    def configure(self, event):
+        self.resize(event.width, event.height)
+
+    def resize(self, width: int, height: int):
+        if (width, height) != (self.width, self.height):
+            self.width = width
+            self.height = height
+            self.resizes += 1
+
+    @property
+    def scale(self) -> tuple:
+        return self.width / self.base_width, self.height / self.base_height
+
+    def spawn_range(self) -> tuple:
+        margin = int(self.spawn_margin * self.scale[0])
+        return margin, max(self.width - margin, margin + 1)
+
+    def center(self) -> tuple:
+        return self.width / 2, self.height / 2
+
+
+class InputState:
+    RIGHT = 1
+    LEFT = 2
+    UP = 4
+    DOWN = 8
+    FIRE = 16
+    KEYS = {"Right": RIGHT, "Left": LEFT, "Up": UP, "Down": DOWN, "space": FIRE}
+
+    def __init__(self, master) -> None:
+        self.master = master
+        self.pressed = set()
+        self.bindings = []
+
+        for key in self.KEYS:
+            self.bind(f"<KeyPress-{key}>", lambda event, key=key: self.pressed.add(key))
+            self.bind(f"<KeyRelease-{key}>", lambda event, key=key: self.pressed.discard(key))
+        self.bind("<FocusOut>", lambda event: self.pressed.clear())
+
+    def bind(self, sequence: str, handler):
+        self.bindings.append((sequence, self.master.bind(sequence, handler, add="+")))
+
+    def unbind(self, event=None):
+        for sequence, funcid in self.bindings:
+            self.master.unbind(sequence, funcid)
+        self.bindings = []
+        self.pressed.clear()
+
+    def buttons(self) -> int:
+        buttons = 0
+        for key in self.pressed:
+            buttons |= self.KEYS[key]
+        return buttons
+
+
+class Player:
+    size = 10
+    step = 25
+    fire_interval = 2
+
+    def __init__(self, world: "World") -> None:
+        self.world = world
+        self.x = self.px = 100
+        self.y = self.py = 100
+        self.cooldown = 0
+
+    def control(self, buttons: int):
+        self.px = self.x
+        self.py = self.y
+        if buttons & InputState.RIGHT:
+            self.right()
+        if buttons & InputState.LEFT:
+            self.left()
+        if buttons & InputState.UP:
+            self.up()
+        if buttons & InputState.DOWN:
+            self.down()
+
+        if self.cooldown:
+            self.cooldown -= 1
+        if buttons & InputState.FIRE and not self.cooldown:
+            self.attack()
+            self.cooldown = self.fire_interval
 
     def right(self, event=None):
-        self.field.move(self.id, 10, 0)
+        self.x += self.step
 
     def left(self, event=None):
-        self.field.move(self.id, -10, 0)
+        self.x -= self.step
 
-    def up(self, event=None):        
-        self.field.move(self.id, 0, -10)
+    def up(self, event=None):
+        self.y -= self.step
 
     def down(self, event=None):
-        self.field.move(self.id, 0, 10)
-    
+        self.y += self.step
+
     def attack(self, event=None):
-        x1, y1, x2, y2 = self.field.bbox(self.id)
+        x1, y1, x2, y2 = self.bbox()
         x_center = x2 - (x2 - x1) / 2
         y_center = y2 - (y2 - y1) / 2
-        shots.append(Shot(self.field, x_center, y_center))
+        self.world.shots.spawn(x_center - Shot.width / 2, y_center)
 
+    def bbox(self, alpha: float = 1.0) -> tuple:
+        x = self.px + (self.x - self.px) * alpha
+        y = self.py + (self.y - self.py) * alpha
+        return x, y, x + self.size, y + self.size
 
-class Enemy:
-    def __init__(self, field: tkinter.Canvas) -> None:
+
+class Lifecycle:
+    def __init__(self, world: "World", margin: int = 0) -> None:
+        self.world = world
+        self.margin = margin
+        self.culled = {Enemy: 0, Shot: 0}
+
+    def bounds(self) -> tuple:
+        return -self.margin, -self.margin, self.world.width + self.margin, self.world.height + self.margin
+
+    def cull(self) -> int:
+        culled = 0
+        for store in (self.world.enemies, self.world.shots):
+            outside = store.find_outside(*self.bounds())
+            store.remove(outside)
+            self.culled[store.kind] += len(outside)
+            culled += len(outside)
+        return culled
+
+    def live_counts(self) -> dict:
+        return {"enemies": len(self.world.enemies), "shots": len(self.world.shots)}
+
+
+class Wave:
+    patterns = ("random", "sweep", "line")
+
+    def __init__(self, count: int, pattern: str = "random", interval: int = 10, enemy=Enemy) -> None:
+        if pattern not in self.patterns:
+            raise ValueError(f"unknown wave pattern: {pattern}")
+        self.count = count
+        self.pattern = pattern
+        self.interval = interval
+        self.enemy = enemy
+
+    def compile(self, rng: random.Random) -> tuple:
+        n = np.arange(self.count)
+        if self.pattern == "line":
+            ticks = np.zeros(self.count, dtype=np.int64)
+            positions = (n + 0.5) / self.count
+        else:
+            ticks = n * self.interval
+            if self.pattern == "sweep":
+                positions = n / max(self.count - 1, 1)
+            else:
+                positions = np.array([rng.random() for _ in range(self.count)])
+        return ticks, positions
+
+    def duration(self) -> int:
+        return 0 if self.pattern == "line" else max(self.count - 1, 0) * self.interval
+
+
+class FastEnemy(Enemy):
+    vy = 10
+    point = 2
+
+
+class DriftEnemy(Enemy):
+    vx = 2
+    vy = 4
+    point = 3
+
+
+WAVES = [
+    Wave(10, "random", interval=10),
+    Wave(8, "sweep", interval=4),
+    Wave(6, "line", enemy=FastEnemy),
+    Wave(20, "random", interval=3, enemy=DriftEnemy),
+]
+
+
+class SpawnScheduler:
+    def __init__(self, waves: list, rng: random.Random, gap: int = 20, repeat: bool = True) -> None:
+        self.waves = waves
+        self.rng = rng
+        self.gap = gap
+        self.repeat = repeat
+        self.kinds = list(dict.fromkeys(wave.enemy for wave in waves))
+
+        self.offset = 0
+        self.compile()
+
+    def compile(self):
+        ticks, positions, kinds = [np.zeros(0, dtype=np.int64)], [np.zeros(0)], [np.zeros(0, dtype=np.int64)]
+        start = 0
+        for wave in self.waves:
+            wave_ticks, wave_positions = wave.compile(self.rng)
+            ticks.append(wave_ticks + start)
+            positions.append(wave_positions)
+            kinds.append(np.full(wave.count, self.kinds.index(wave.enemy), dtype=np.int64))
+            start += wave.duration() + self.gap
+
+        order = np.argsort(np.concatenate(ticks), kind="stable")
+        self.ticks = np.concatenate(ticks)[order]
+        self.positions = np.concatenate(positions)[order].tolist()
+        self.kind_ids = np.concatenate(kinds)[order].tolist()
+        self.length = start
+        self.cursor = 0
+
+    def spawn(self, world: "World", tick: int) -> int:
+        if self.repeat and self.length and tick - self.offset >= self.length:
+            self.offset += self.length
+            self.compile()
+
+        end = int(np.searchsorted(self.ticks, tick - self.offset, side="right"))
+        if end == self.cursor:
+            return 0
+
+        low, high = world.viewport.spawn_range()
+        for i in range(self.cursor, end):
+            kind = self.kinds[self.kind_ids[i]]
+            world.enemies.spawn(low + self.positions[i] * (high - low), 0, kind.vx, kind.vy, kind.point)
+        spawned = end - self.cursor
+        self.cursor = end
+        return spawned
+
+    def pending(self) -> int:
+        return len(self.ticks) - self.cursor
+
+
+class World:
+    def __init__(self, width: int, height: int, seed=None, broadphase: Broadphase = None,
+                 profiler: FrameProfiler = None, waves: list = None) -> None:
+        self.viewport = Viewport(width, height)
+        self.random = random.Random(seed)
+
+        self.player = Player(world=self)
+        self.enemies = EntityStore(Enemy)
+        self.shots = EntityStore(Shot)
+        self.broadphase = broadphase or UniformGrid()
+        self.profiler = profiler or NullProfiler()
+        self.lifecycle = Lifecycle(world=self)
+        self.score = 0
+        self.enemies_reached_bottom = 0
+        self.enemies_shot = 0
+
+        self.tick_count = 0
+        self.spawner = SpawnScheduler(WAVES if waves is None else waves, self.random)
+        self.max_reached_bottom = 3
+
+    @property
+    def width(self) -> int:
+        return self.viewport.width
+
+    @property
+    def height(self) -> int:
+        return self.viewport.height
+
+    def step(self, buttons: int = 0) -> bool:
+        profiler = self.profiler
+        with profiler.phase("input"):
+            self.player.control(buttons)
+
+        with profiler.phase("spawn"):
+            if not self.is_over():
+                self.spawner.spawn(self, self.tick_count)
+            self.tick_count += 1
+
+        with profiler.phase("enemy_move"):
+            self.enemies.move()
+            # 横に流れる敵は左右の端で跳ね返し、必ず撃墜か到達のどちらかで数えられるようにする
+            self.enemies.bounce(0, self.width)
+            reached = self.enemies.find_below(self.height)
+            self.enemies_reached_bottom += len(reached)
+            self.enemies.remove(reached)
+
+        with profiler.phase("broadphase"):
+            self.broadphase.update(self.enemies)
+
+        with profiler.phase("shot_move"):
+            self.shots.move()
+
+        with profiler.phase("cull"):
+            self.lifecycle.cull()
+
+        with profiler.phase("overlap"):
+            for shot in self.shots.indices():
+                shotted_enemy = self.find_overlap(*self.shots.bbox(shot))
+                if shotted_enemy is not None:
+                    self.shots.remove(shot)
+                    self.enemies.remove(shotted_enemy)
+                    self.enemies_shot += 1
+                    self.score += int(self.enemies.point[shotted_enemy])
+
+        for name, count in self.lifecycle.live_counts().items():
+            profiler.gauge(name, count)
+
+        return not self.is_over()
+
+    def find_overlap(self, x1, y1, x2, y2):
+        for enemy in self.broadphase.query(x1, y1, x2, y2):
+            if not self.enemies.alive[enemy]:
+                continue
+            ex1, ey1, ex2, ey2 = self.enemies.bbox(enemy)
+            if x1 <= ex2 and ex1 <= x2 and y1 <= ey2 and ey1 <= y2:
+                return enemy
+
+    def is_over(self) -> bool:
+        return self.enemies_reached_bottom >= self.max_reached_bottom
+
+    def unaccounted_enemies(self) -> int:
+        return self.enemies.next_serial - self.enemies_shot - self.enemies_reached_bottom - len(self.enemies)
+
+
+class TclBatch:
+    def __init__(self, field: tkinter.Canvas, enabled: bool = True) -> None:
         self.field = field
-        self.field.update_idletasks()
-        rand_x = random.randrange(50, self.field.winfo_width() - 50)
-        self.id = self.field.create_rectangle(rand_x, 0, rand_x+20, 20, fill="red")
+        self.path = str(field)
+        self.enabled = enabled
+        self.commands = []
 
-        self.point = 1
-        
-    def move(self):
-        self.field.move(self.id, 0, 5)
+        self.queued = 0
+        self.flushes = 0
+
+    def coords(self, item: int, *coords):
+        if self.enabled:
+            self.commands.append(f"{self.path} coords {item} {' '.join(map(str, coords))}")
+        else:
+            self.field.coords(item, *coords)
+
+    def state(self, item: int, state: str):
+        if self.enabled:
+            self.commands.append(f"{self.path} itemconfigure {item} -state {state}")
+        else:
+            self.field.itemconfigure(item, state=state)
+
+    def delete(self, item: int):
+        if self.enabled:
+            self.commands.append(f"{self.path} delete {item}")
+        else:
+            self.field.delete(item)
+
+    def flush(self):
+        if not self.commands:
+            return
+        self.field.tk.eval("\n".join(self.commands))
+        self.queued += len(self.commands)
+        self.flushes += 1
+        self.commands = []
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "commands": self.queued,
+            "scripts": self.flushes,
+            "calls_saved": self.queued - self.flushes,
+        }
+
+
+class ReplayMismatch(Exception):
+    pass
+
+
+class InputRecorder:
+    header = struct.Struct("<4sQII")
+    resize_event = struct.Struct("<II")
+    result = struct.Struct("<qII")
+    magic = b"TKR3"
+    resize_marker = 0xFF
+    end_marker = 0xFE
+
+    def __init__(self, world: "World", seed: int) -> None:
+        self.world = world
+        self.size = (world.width, world.height)
+        self.buffer = bytearray(self.header.pack(self.magic, seed, *self.size))
+        self.ticks = 0
+
+    def record(self, buttons: int):
+        size = (self.world.width, self.world.height)
+        if size != self.size:
+            self.size = size
+            self.buffer.append(self.resize_marker)
+            self.buffer += self.resize_event.pack(*size)
+        self.buffer.append(buttons)
+        self.ticks += 1
+
+    def finish(self) -> bytes:
+        return bytes(self.buffer) + bytes([self.end_marker]) + self.result.pack(
+            self.world.score, self.world.enemies_reached_bottom, self.ticks
+            )
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.finish())
+
+
+def replay(data: bytes, profiler: FrameProfiler = None, broadphase: Broadphase = None) -> "World":
+    if len(data) < InputRecorder.header.size + 1 + InputRecorder.result.size:
+        raise ReplayMismatch("replay is truncated")
+    magic, seed, width, height = InputRecorder.header.unpack_from(data)
+    if magic != InputRecorder.magic:
+        raise ReplayMismatch("not a replay file")
+
+    world = World(width, height, seed=seed, broadphase=broadphase, profiler=profiler)
+    offset = InputRecorder.header.size
+    ticks = 0
+    end = len(data) - InputRecorder.result.size
+    while offset < end:
+        marker = data[offset]
+        offset += 1
+        if marker == InputRecorder.resize_marker:
+            world.viewport.resize(*InputRecorder.resize_event.unpack_from(data, offset))
+            offset += InputRecorder.resize_event.size
+        elif marker == InputRecorder.end_marker:
+            expected = InputRecorder.result.unpack_from(data, offset)
+            actual = (world.score, world.enemies_reached_bottom, ticks)
+            if actual != expected:
+                raise ReplayMismatch(f"score, reached bottom, ticks: expected {expected}, got {actual}")
+            if world.unaccounted_enemies():
+                raise ReplayMismatch(f"{world.unaccounted_enemies()} enemies left the field without being counted")
+            return world
+        else:
+            world.step(marker)
+            ticks += 1
+
+    raise ReplayMismatch("replay is truncated")
+
+
+class CanvasItemPool:
+    def __init__(self, commands: TclBatch, create, size: int = 0, max_size: int = 512) -> None:
+        self.commands = commands
+        self.create = create
+        self.max_size = max_size
+        self.free = [self.create((0, 0, 0, 0), state="hidden") for _ in range(size)]
+
+        self.hits = 0
+        self.misses = 0
+        self.discards = 0
+
+    def acquire(self, coords: tuple) -> int:
+        if self.free:
+            self.hits += 1
+            item = self.free.pop()
+            self.commands.coords(item, *coords)
+            self.commands.state(item, "normal")
+            return item
+
+        self.misses += 1
+        return self.create(coords)
+
+    def release(self, item: int):
+        if len(self.free) < self.max_size:
+            self.commands.state(item, "hidden")
+            self.free.append(item)
+        else:
+            self.discards += 1
+            self.commands.delete(item)
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "discards": self.discards,
+            "free": len(self.free),
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
+
+
+class CanvasRenderer:
+    def __init__(self, field: tkinter.Canvas, world: World, pool_size: int = 32, max_pool_size: int = 512,
+                 batch: bool = True) -> None:
+        self.field = field
+        self.world = world
+        self.commands = TclBatch(self.field, enabled=batch)
+        self.items = {}
+        self.pools = {
+            Enemy: CanvasItemPool(self.commands, self.create_enemy, pool_size, max_pool_size),
+            Shot: CanvasItemPool(self.commands, self.create_shot, pool_size, max_pool_size),
+        }
+
+        self.player_id = self.field.create_rectangle(*self.world.player.bbox(), fill="black")
+
+        self.score = self.world.score
+        self.score_text = self.field.create_text(10, 10, text=f"score {self.score}", fill="black", anchor="w")
+
+        self.enemies_reached_bottom = self.world.enemies_reached_bottom
+        self.enemies_reached_bottom_text = self.field.create_text(
+            100, 10, text=f"reached bottom {self.enemies_reached_bottom}", fill="black", anchor="w"
+            )
+
+    def sync(self, alpha: float = 1.0):
+        profiler = self.world.profiler
+        with profiler.phase("render"):
+            items = {}
+            self.sync_store(self.world.enemies, items, self.enemy_coords, alpha)
+            self.sync_store(self.world.shots, items, self.shot_coords, alpha)
+
+            for (kind, _), item in self.items.items():
+                self.pools[kind].release(item)
+            self.items = items
+
+            self.commands.coords(self.player_id, *self.world.player.bbox(alpha))
+            pending = len(self.commands.commands)
+            self.commands.flush()
+            profiler.gauge("tcl_batched", pending)
+
+        with profiler.phase("score_text"):
+            if self.score != self.world.score:
+                self.score = self.world.score
+                self.field.itemconfigure(self.score_text, text=f"score {self.score}")
+
+            if self.enemies_reached_bottom != self.world.enemies_reached_bottom:
+                self.enemies_reached_bottom = self.world.enemies_reached_bottom
+                self.field.itemconfigure(
+                    self.enemies_reached_bottom_text, text=f"reached bottom {self.enemies_reached_bottom}"
+                    )
+
+    def sync_store(self, store: EntityStore, items: dict, to_coords, alpha: float = 1.0):
+        pool = self.pools[store.kind]
+        indices = store.indices()
+        serials = store.serial[indices].tolist()
+        bboxes = zip(*(a.tolist() for a in store.bboxes(indices, alpha)))
+        for serial, bbox in zip(serials, bboxes):
+            key = (store.kind, serial)
+            coords = to_coords(*bbox)
+            item = self.items.pop(key, None)
+            if item is None:
+                item = pool.acquire(coords)
+            else:
+                self.commands.coords(item, *coords)
+            items[key] = item
+
+    def create_enemy(self, coords, **options):
+        return self.field.create_rectangle(*coords, fill="red", **options)
+
+    def create_shot(self, coords, **options):
+        return self.field.create_line(*coords, width=3, **options)
+
+    def stats(self) -> dict:
+        return {
+            "tcl": self.commands.stats(),
+            "enemy_items": self.pools[Enemy].stats(),
+            "shot_items": self.pools[Shot].stats(),
+            "enemy_slots": self.world.enemies.stats(),
+            "shot_slots": self.world.shots.stats(),
+        }
+
+    def enemy_coords(self, x1, y1, x2, y2) -> tuple:
+        return x1, y1, x2, y2
+
+    def shot_coords(self, x1, y1, x2, y2) -> tuple:
+        x_center = (x1 + x2) / 2
+        return x_center, y1, x_center, y2
 
-    def check_reach_bottom(self):
-        height = self.field.winfo_height()
-        _, y1, _, _ = self.field.coords(self.id)
-        if y1 > height:
-            return True
+
+class GameLoop:
+    def __init__(self, master, update, render, on_finish=None, profiler: FrameProfiler = None,
+                 timestep: float = 0.1, fps: int = 60, max_steps: int = 5) -> None:
+        self.master = master
+        self.update = update
+        self.render = render
+        self.on_finish = on_finish
+        self.profiler = profiler or NullProfiler()
+
+        self.timestep = timestep
+        self.frame_interval = 1 / fps
+        self.max_steps = max_steps
+
+        self.accumulator = 0.0
+        self.previous = None
+        self.next_frame = None
+        self.after_id = None
+
+        self.steps = 0
+        self.frames = 0
+        self.dropped_steps = 0
+
+    def start(self):
+        self.previous = self.next_frame = time.perf_counter()
+        self.accumulator = 0.0
+        self.frame()
+
+    def stop(self):
+        if self.after_id is not None:
+            self.master.after_cancel(self.after_id)
+            self.after_id = None
+
+    def frame(self):
+        self.after_id = None
+        now = time.perf_counter()
+        self.accumulator += now - self.previous
+        self.previous = now
+
+        running = True
+        steps = 0
+        while running and self.accumulator >= self.timestep and steps < self.max_steps:
+            running = self.update()
+            self.accumulator -= self.timestep
+            steps += 1
+        self.steps += steps
+
+        if self.accumulator >= self.timestep:
+            self.dropped_steps += int(self.accumulator // self.timestep)
+            self.accumulator %= self.timestep
+
+        self.render(self.accumulator / self.timestep)
+        self.frames += 1
+        self.profiler.end_frame(steps)
+
+        if not running:
+            if self.on_finish:
+                self.on_finish()
+            return
+
+        self.next_frame = max(self.next_frame + self.frame_interval, now)
+        delay = int((self.next_frame - time.perf_counter()) * 1000)
+        self.after_id = self.master.after(max(delay, 1), self.frame)
 
 
 class GameWindow:
     def __init__(self, master) -> None:
         self.master = master
+        self.master.rowconfigure(0, weight=1)
+        self.master.columnconfigure(0, weight=1)
         self.frame = {}
-        self.ranking = Ranking()
+        self.ranking = create_ranking()
+        self.game_loop = None
+        self.game_field = None
 
         self.create_start_window()
 
@@ -86,7 +1021,7 @@ class GameWindow:
 
     def create_game_field(self):
         self.frame["game_field"] = tkinter.Frame(self.master)
-        self.frame["game_field"].grid(column=0, row=0)
+        self.frame["game_field"].grid(column=0, row=0, sticky="nsew")
 
         game_title_label = tkinter.Label(self.frame["game_field"], text="Tkinter Shot", font=("メイリオ", 20))
         game_title_label.grid(column=0, row=0)
@@ -94,16 +1029,29 @@ class GameWindow:
         self.game_field = GameField(self.frame["game_field"])
 
     def game_start(self, event=None):
+        self.game_stop()
         self.frame_refresh()
         self.create_game_field()
-        self.game_field.add_enemy()
-        self.game_field_update()
-    
-    def game_field_update(self):
-        if self.game_field.update():
-            self.master.after(100, self.game_field_update)
-        else:
-            self.master.after(5000, self.game_finish)
+        self.game_loop = GameLoop(self.master, self.game_field.update, self.game_field.render,
+                                  on_finish=self.game_over, profiler=self.game_field.profiler)
+        self.game_loop.start()
+
+    def game_over(self):
+        self.game_field.show_game_over()
+        self.master.after(5000, self.game_finish)
+
+    def dump_profile(self, path="./profile.json"):
+        if self.game_field:
+            self.game_field.profiler.dump(path)
+
+    def save_replay(self, path="./replay.tkr"):
+        if self.game_field:
+            self.game_field.recorder.save(path)
+
+    def game_stop(self):
+        if self.game_loop:
+            self.game_loop.stop()
+            self.game_loop = None
 
     def create_ranking_window(self):
         self.ranking.write(self.game_field.score)
@@ -125,9 +1073,8 @@ class GameWindow:
 
 
     def game_finish(self):
+        self.game_stop()
         self.frame_refresh()
-        global shots
-        shots = []
         self.create_ranking_window()
 
     def frame_refresh(self):
@@ -138,101 +1085,256 @@ class GameWindow:
 class GameField:
     def __init__(self, master) -> None:
         self.game_canvas = tkinter.Canvas(master, bg="#cceb51")
-        self.game_canvas.grid(column=0, row=1)
-        self.player = Player(field=self.game_canvas)
-        self.enemies = []
-        self.score = 0
-        self.score_text = self.game_canvas.create_text(10, 10, text=f"score {self.score}", fill="black", anchor="w")
+        self.game_canvas.grid(column=0, row=1, sticky="nsew")
+        master.rowconfigure(1, weight=1)
+        master.columnconfigure(0, weight=1)
 
-        self.enemies_reached_bottom = 0
-        self.enemies_reached_bottom_text = self.game_canvas.create_text(
-            100, 10, text=f"reached bottom {self.enemies_reached_bottom}", fill="black", anchor="w"
-            )
-        
-        root.bind("<KeyPress-Right>", self.player.right)
-        root.bind("<KeyPress-Left>", self.player.left)
-        root.bind("<KeyPress-Up>", self.player.up)
-        root.bind("<KeyPress-Down>", self.player.down)
-        root.bind("<KeyPress-space>", self.player.attack)
-
-    def add_enemy(self):
-        self.enemies.append(Enemy(field=self.game_canvas))
-        if self.enemies_reached_bottom < 3:
-            self.game_canvas.after(1000, self.add_enemy)
-            
+        self.profiler = FrameProfiler()
+        self.profiler.attach(self.game_canvas)
 
-    def update(self, event=None):
-        enemy_ids = []
-        for enemy in self.enemies:
-            enemy.move()
-            if enemy.check_reach_bottom():
-                self.enemies_reached_bottom += 1
-                self.game_canvas.itemconfigure(
-                    self.enemies_reached_bottom_text, text=f"reached bottom {self.enemies_reached_bottom}"
-                    )
-                self.game_canvas.delete(enemy.id)
-                self.enemies.remove(enemy)
-            else:
-                enemy_ids.append(enemy.id)
+        # 実際の大きさは<Configure>で届くので、ここでは要求サイズから始める
+        width, height = (int(self.game_canvas.cget(option)) for option in ("width", "height"))
+        seed = random.randrange(2 ** 63)
+        self.world = World(width, height, seed=seed, profiler=self.profiler)
+        self.recorder = InputRecorder(self.world, seed)
+        self.viewport = self.world.viewport
+        self.game_canvas.bind("<Configure>", self.viewport.configure)
+        self.player = self.world.player
+        self.renderer = CanvasRenderer(self.game_canvas, self.world)
+        self.overlay = ProfilerOverlay(self.game_canvas, self.profiler)
 
-        for shot in shots:
-            shot.move()
-            overlap_enemy_ids = list(set(enemy_ids) & set(shot.check_overlap()))
-            if overlap_enemy_ids:
-                self.game_canvas.delete(shot.id)
-                shots.remove(shot)
+        self.input = InputState(root)
+        self.input.bind("<KeyPress-F3>", self.overlay.toggle)
+        self.game_canvas.bind("<Destroy>", self.input.unbind)
 
-                self.game_canvas.delete(overlap_enemy_ids[0])
-                shotted_enemy = self.enemies.pop(enemy_ids.index(overlap_enemy_ids[0]))
+    @property
+    def score(self):
+        return self.world.score
 
-                self.score += shotted_enemy.point
-                self.game_canvas.itemconfigure(self.score_text, text=f"score {self.score}")
+    def update(self, event=None):
+        buttons = self.input.buttons()
+        self.recorder.record(buttons)
+        return self.world.step(buttons)
 
-        if self.enemies_reached_bottom < 3:
-            return True
-        else:
-            self.game_canvas.create_text(self.game_canvas.winfo_width() / 2, self.game_canvas.winfo_height() /2,
-                                    text="Game Over !", fill="black", font="メイリオ, 20")
-            return False
+    def render(self, alpha: float = 1.0):
+        self.renderer.sync(alpha)
+        self.overlay.update()
+        with self.profiler.phase("tk_redraw"):
+            self.game_canvas.update_idletasks()
+
+    def show_game_over(self):
+        self.game_canvas.create_text(*self.viewport.center(),
+                                text="Game Over !", fill="black", font="メイリオ, 20")
 
 
 class Ranking:
-    def __init__(self) -> None:
-        self.path = "./rank.csv"
-        self.display_rank = 5
+    record = struct.Struct("<qq")
+    index_header = struct.Struct("<4sqI")
+    index_entry = struct.Struct("<qqq")
+    index_magic = b"RNK1"
+    time_format = "%Y/%m/%d %H:%M:%S"
+
+    def __init__(self, directory: str = ".", display_rank: int = 5, index_size: int = 100) -> None:
+        self.path = os.path.join(directory, "rank.dat")
+        self.index_path = os.path.join(directory, "rank.idx")
+        self.legacy_path = os.path.join(directory, "rank.csv")
+        self.display_rank = display_rank
+        self.index_size = max(index_size, display_rank)
+        self.top = None
+        self.records = 0
 
     def get_rank(self):
-        score = self.read()
-        return sorted(score, key=lambda s: int(s[1]), reverse=True)[:self.display_rank]
+        top = sorted(self.load_index(), reverse=True)[:self.display_rank]
+        return [[self.format_time(timestamp), score] for score, _, timestamp in top]
 
     def write(self, score):
-        with open(self.path, "a", newline="") as f:
-            writer = csv.writer(f)
-            create_time = datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")
-            writer.writerow([create_time, score])
+        top = self.load_index()
+        timestamp = int(time.time())
+        with open(self.path, "ab") as f:
+            size = f.seek(0, os.SEEK_END)
+            # 書き込み途中で止まったレコードの残りを捨て、以降のレコードの位置がずれないようにする
+            if size % self.record.size:
+                size -= size % self.record.size
+                f.truncate(size)
+            seq = size // self.record.size
+            f.write(self.record.pack(timestamp, score))
             f.flush()
-        
+
+        if seq != self.records:
+            # 読み込んだ後に別のウィンドウが書き込んだ
+            self.rebuild_index()
+        else:
+            self.push(top, (score, -seq, timestamp))
+            self.records = seq + 1
+            self.save_index(self.records)
+
     def read(self):
-        with open(self.path, "r") as f:
-            reader = csv.reader(f)
-            return list(reader)
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for timestamp, score in self.record.iter_unpack(data[:len(data) - len(data) % self.record.size]):
+            yield timestamp, score
+
+    def push(self, top: list, entry: tuple) -> bool:
+        if len(top) < self.index_size:
+            heapq.heappush(top, entry)
+        elif entry > top[0]:
+            heapq.heapreplace(top, entry)
+        else:
+            return False
+        return True
+
+    def load_index(self) -> list:
+        # 別のウィンドウが書き込んでいればレコード数が変わるので、そのときは読み直す
+        records = self.count_records()
+        if self.top is not None and records == self.records:
+            return self.top
+
+        if not os.path.isfile(self.path) and os.path.isfile(self.legacy_path):
+            self.migrate()
+            records = self.count_records()
+
+        if os.path.isfile(self.index_path):
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+            # 途中で切れた・壊れた索引は読まずに作り直す（索引はrank.datから作れるキャッシュ）
+            magic, indexed, count = (None, 0, 0)
+            if len(data) >= self.index_header.size:
+                magic, indexed, count = self.index_header.unpack_from(data)
+            if (magic == self.index_magic and indexed == records and count <= self.index_size
+                    and len(data) == self.index_header.size + count * self.index_entry.size):
+                entries = self.index_entry.iter_unpack(data[self.index_header.size:])
+                self.top = [(score, -seq, timestamp) for seq, timestamp, score in entries]
+                self.records = records
+                return self.top
+
+        self.rebuild_index()
+        return self.top
+
+    def rebuild_index(self):
+        self.top = []
+        seq = 0
+        for seq, (timestamp, score) in enumerate(self.read(), start=1):
+            self.push(self.top, (score, -(seq - 1), timestamp))
+        self.records = seq
+        self.save_index(seq)
+
+    def save_index(self, records: int):
+        data = [self.index_header.pack(self.index_magic, records, len(self.top))]
+        data.extend(self.index_entry.pack(-negative_seq, timestamp, score) for score, negative_seq, timestamp in self.top)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(data))
+        os.replace(tmp_path, self.index_path)
+
+    def count_records(self) -> int:
+        if os.path.isfile(self.path):
+            return os.path.getsize(self.path) // self.record.size
+        return 0
+
+    def migrate(self):
+        with open(self.legacy_path, "r") as f:
+            rows = [row for row in csv.reader(f) if len(row) == 2]
+        with open(self.path, "wb") as f:
+            for create_time, score in rows:
+                timestamp = datetime.datetime.strptime(create_time, self.time_format).timestamp()
+                f.write(self.record.pack(int(timestamp), int(score)))
+
+    def format_time(self, timestamp: int) -> str:
+        return datetime.datetime.fromtimestamp(timestamp).strftime(self.time_format)
+
+
+class SQLiteRanking:
+    time_format = "%Y/%m/%d %H:%M:%S"
+    periods = {"daily": datetime.timedelta(days=1), "weekly": datetime.timedelta(weeks=1)}
+
+    def __init__(self, directory: str = ".", display_rank: int = 5) -> None:
+        self.path = os.path.join(directory, "rank.sqlite3")
+        self.legacy_path = os.path.join(directory, "rank.csv")
+        self.display_rank = display_rank
+
+        self.connection = sqlite3.connect(self.path, timeout=5, cached_statements=16)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS rank (id INTEGER PRIMARY KEY, created_at INTEGER NOT NULL, "
+                "score INTEGER NOT NULL)"
+                )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS rank_score ON rank (score DESC, id)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS rank_created_at ON rank (created_at)")
+
+        if os.path.isfile(self.legacy_path) and not self.connection.execute("SELECT 1 FROM rank LIMIT 1").fetchone():
+            self.migrate()
+
+    def get_rank(self, period: str = None):
+        if period is None:
+            rows = self.connection.execute(
+                "SELECT created_at, score FROM rank ORDER BY score DESC, id LIMIT ?", (self.display_rank,)
+                )
+        else:
+            since = datetime.datetime.now() - self.periods[period]
+            rows = self.connection.execute(
+                "SELECT created_at, score FROM rank WHERE created_at >= ? ORDER BY score DESC, id LIMIT ?",
+                (int(since.timestamp()), self.display_rank)
+                )
+        return [[self.format_time(created_at), score] for created_at, score in rows]
+
+    def write(self, score):
+        self.write_many([score])
+
+    def write_many(self, scores):
+        timestamp = int(time.time())
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO rank (created_at, score) VALUES (?, ?)", ((timestamp, score) for score in scores)
+                )
+
+    def migrate(self):
+        with open(self.legacy_path, "r") as f:
+            rows = [row for row in csv.reader(f) if len(row) == 2]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO rank (created_at, score) VALUES (?, ?)",
+                ((int(datetime.datetime.strptime(create_time, self.time_format).timestamp()), int(score))
+                 for create_time, score in rows)
+                )
+
+    def close(self):
+        self.connection.close()
+
+    def format_time(self, timestamp: int) -> str:
+        return datetime.datetime.fromtimestamp(timestamp).strftime(self.time_format)
+
+
+RANKING_BACKENDS = {"file": Ranking, "sqlite": SQLiteRanking}
+RANKING_BACKEND = os.environ.get("TKSHOT_RANKING_BACKEND", "file")
+
+
+def create_ranking(backend: str = None, directory: str = "."):
+    return RANKING_BACKENDS[backend or RANKING_BACKEND](directory)
 
 
-root = tkinter.Tk()
-root.title("Tkinter Game")
+if __name__ == "__main__":
+    import ctypes
+    ctypes.windll.shcore.SetProcessDpiAwareness(1)
 
-game_window = GameWindow(root)
+    root = tkinter.Tk()
+    root.title("Tkinter Game")
 
-menubar = tkinter.Menu(root)
-root.option_add('*tearOff', False)
-root.config(menu=menubar)
+    game_window = GameWindow(root)
 
-menu_ctrl = tkinter.Menu(menubar)
-menubar.add_cascade(menu=menu_ctrl, label="操作")
-menu_ctrl.add_command(label="ゲーム開始", command=game_window.game_start)
-menu_ctrl.add_command(label="ゲーム終了", command=game_window.game_finish)
-menu_ctrl.add_command(label="ランキング", command=game_window.move_ranking_window)
+    menubar = tkinter.Menu(root)
+    root.option_add('*tearOff', False)
+    root.config(menu=menubar)
 
-shots = []
+    menu_ctrl = tkinter.Menu(menubar)
+    menubar.add_cascade(menu=menu_ctrl, label="操作")
+    menu_ctrl.add_command(label="ゲーム開始", command=game_window.game_start)
+    menu_ctrl.add_command(label="ゲーム終了", command=game_window.game_finish)
+    menu_ctrl.add_command(label="ランキング", command=game_window.move_ranking_window)
+    menu_ctrl.add_command(label="計測結果を保存", command=game_window.dump_profile)
+    menu_ctrl.add_command(label="リプレイを保存", command=game_window.save_replay)
 
-root.mainloop()
+    root.mainloop()
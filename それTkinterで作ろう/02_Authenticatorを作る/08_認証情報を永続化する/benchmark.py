@@ -0,0 +1,128 @@
+import argparse
+import base64
+import json
+import platform
+import random
+import time
+
+from part8 import TOTPAuthenticator, QrDecoder
+
+
+WINDOWS = [1, 5, 20]
+
+
+def random_secret(rng: random.Random) -> str:
+    return base64.b32encode(rng.randbytes(20)).decode().rstrip("=")
+
+
+def bench_generate(count: int, seed: int) -> dict:
+    authenticator = TOTPAuthenticator(random_secret(random.Random(seed)))
+    start = time.perf_counter()
+    for counter in range(count):
+        authenticator.generate_totp_at(counter)
+    elapsed = time.perf_counter() - start
+    return {"codes": count, "codes_per_sec": count / elapsed}
+
+
+def bench_verify(window: int, count: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    authenticator = TOTPAuthenticator(random_secret(rng), replay_cache_size=count)
+    now = int(time.time())
+
+    # 半分は時間窓の端で一致するコード、半分は一致しないコードを検証する
+    requests = []
+    for i in range(count):
+        timestamp = now + i * authenticator.time_step
+        if i % 2 == 0:
+            requests.append((authenticator.generate_totp(timestamp + window * authenticator.time_step), timestamp))
+        else:
+            requests.append((f"{rng.randrange(10 ** 6):06d}", timestamp))
+
+    start = time.perf_counter()
+    for code, timestamp in requests:
+        authenticator.verify_totp(code, timestamp, window)
+    verify_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    accepted = sum(authenticator.match_totp(code, timestamp, window) is not None for code, timestamp in requests)
+    match_elapsed = time.perf_counter() - start
+
+    return {
+        "window": window,
+        "requests": count,
+        "accepted": accepted,
+        "verify_per_sec": count / verify_elapsed,
+        "match_per_sec": count / match_elapsed,
+    }
+
+
+def qr_image(size: int):
+    """指定した大きさの画像の中央にQRコードを描いた画像を作る（OpenCVが必要）"""
+    import cv2
+    import numpy as np
+    from PIL import Image
+
+    code = cv2.QRCodeEncoder.create().encode("otpauth://totp/bench?secret=JBSWY3DPEHPK3PXP&issuer=bench")
+    code = cv2.resize(code, None, fx=8, fy=8, interpolation=cv2.INTER_NEAREST)
+    canvas = np.full((size, size), 255, dtype=np.uint8)
+    top = (size - code.shape[0]) // 2
+    canvas[top:top + code.shape[0], top:top + code.shape[1]] = code
+    return Image.fromarray(canvas).convert("RGB")
+
+
+def bench_decode(size: int) -> dict:
+    decoder = QrDecoder()
+    decoder.warm_up().result()
+    image = qr_image(size)
+
+    start = time.perf_counter()
+    qrdata = decoder.decode(image).result()
+    elapsed = time.perf_counter() - start
+    decoder.shutdown()
+    return {
+        "size": size,
+        "decoded": len(qrdata),
+        "elapsed_ms": elapsed * 1000,
+        "timings_ms": {name: seconds * 1000 for name, seconds in decoder.timings.items()},
+        "peak_bytes": decoder.peak_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TOTP生成・検証のベンチマーク")
+    parser.add_argument("--windows", type=int, nargs="+", default=WINDOWS, help="検証する時間窓の数")
+    parser.add_argument("--count", type=int, default=10000, help="検証する回数")
+    parser.add_argument("--qr-sizes", type=int, nargs="+", default=[],
+                        help="QRコードの読み取りを計測する画像の一辺のピクセル数（OpenCVとQReaderが必要）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("--output", default="bench_result.json", help="結果の出力先")
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "generate": bench_generate(args.count, args.seed),
+        "verify": [],
+    }
+    print(f"generate: {results['generate']['codes_per_sec']:.1f} codes/sec")
+
+    for window in args.windows:
+        result = bench_verify(window, args.count, args.seed)
+        results["verify"].append(result)
+        print(f"window {window:>3}: verify {result['verify_per_sec']:10.1f}/sec  "
+              f"match {result['match_per_sec']:10.1f}/sec  accepted {result['accepted']}")
+
+    results["decode"] = []
+    for size in args.qr_sizes:
+        result = bench_decode(size)
+        results["decode"].append(result)
+        steps = "  ".join(f"{name} {ms:.1f}" for name, ms in result["timings_ms"].items())
+        print(f"decode {size:>5}px: {result['elapsed_ms']:8.1f} ms  peak {result['peak_bytes'] / 2 ** 20:.1f} MiB  "
+              f"decoded {result['decoded']}  ({steps} ms)")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,32 @@ import time
 import base64
 import struct
 import hashlib
+import collections
+import functools
+import concurrent.futures
+import threading
+import tracemalloc
+import collections.abc
+import sqlite3
+import json
 
 import tkinter
-from tkinter import ttk
-from qreader import QReader
-from PIL import ImageGrab
+from tkinter import ttk, messagebox, simpledialog
+from PIL import Image, ImageGrab
 import numpy as np
 import re
 import os
 
 
+_COUNTER = struct.Struct('>Q')
+_CODE = struct.Struct('>I')
+
+
 class TOTPAuthenticator:
-    def __init__(self, secret_key: str, digits: int = 6, time_step: int = 30, hash_algorithm: str = 'sha1'):
+    HASH_ALGORITHMS = {'sha1': hashlib.sha1, 'sha256': hashlib.sha256, 'sha512': hashlib.sha512}
+
+    def __init__(self, secret_key: str, digits: int = 6, time_step: int = 30, hash_algorithm: str = 'sha1',
+                 replay_cache_size: int = 32):
         """
         TOTPオーセンティケーターの初期化
         
@@ -22,12 +36,24 @@ class TOTPAuthenticator:
             secret_key: Base32エンコードされた秘密鍵
             digits: TOTPコードの桁数（デフォルト: 6）
             time_step: タイムステップ（秒）（デフォルト: 30）
-            hash_algorithm: ハッシュアルゴリズム（デフォルト: sha1）
+            hash_algorithm: ハッシュアルゴリズム（sha1 / sha256 / sha512、デフォルト: sha1）
+            replay_cache_size: 再利用を拒否するために記憶する使用済みカウンター数（デフォルト: 32）
         """
+        if hash_algorithm not in self.HASH_ALGORITHMS:
+            raise ValueError(f"Unsupported hash algorithm: {hash_algorithm}")
+
         self.secret_key = self._decode_base32(secret_key)
         self.digits = digits
         self.time_step = time_step
         self.hash_algorithm = hash_algorithm
+        self.modulus = 10 ** digits
+
+        # 鍵のパディング済みHMACを一度だけ作っておき、コード生成時はコピーして使う
+        self.digest = self.HASH_ALGORITHMS[hash_algorithm]
+        self._hmac = hmac.new(self.secret_key, digestmod=self.digest)
+
+        self.used_counters = collections.deque(maxlen=replay_cache_size)
+        self._used_counter_set = set()
 
     def _decode_base32(self, secret_key: str) -> bytes:
         """Base32エンコードされた秘密鍵をデコード"""
@@ -35,12 +61,15 @@ class TOTPAuthenticator:
         padding = '=' * ((8 - len(secret_key)) % 8)
         return base64.b32decode(secret_key.upper() + padding)
 
-    def _get_counter(self, timestamp: int = None) -> bytes:
-        """現在時刻からカウンター値を生成"""
+    def get_counter(self, timestamp: int = None) -> int:
+        """現在時刻からカウンター値（整数）を生成"""
         if timestamp is None:
             timestamp = int(time.time())
-        counter = timestamp // self.time_step
-        return struct.pack('>Q', counter)
+        return int(timestamp) // self.time_step
+
+    def _get_counter(self, timestamp: int = None) -> bytes:
+        """現在時刻からカウンター値を生成"""
+        return _COUNTER.pack(self.get_counter(timestamp))
 
     def generate_totp(self, timestamp: int = None) -> str:
         """
@@ -52,26 +81,34 @@ class TOTPAuthenticator:
         Returns:
             生成されたTOTPコード
         """
-        # カウンター値の生成
-        counter = self._get_counter(timestamp)
+        return self.generate_totp_at(self.get_counter(timestamp))
+
+    def generate_totp_at(self, counter: int) -> str:
+        """
+        指定したカウンター値のTOTPコードを生成
         
+        Args:
+            counter: カウンター値（Unix時間 // タイムステップ）
+            
+        Returns:
+            生成されたTOTPコード
+        """
+        # 指定桁数に変換
+        code = str(self._truncate(counter))
+        return code.zfill(self.digits)
+
+    def _truncate(self, counter: int) -> int:
+        """指定したカウンター値のTOTPコードを整数で計算"""
         # HMACの計算
-        hmac_obj = hmac.new(
-            self.secret_key,
-            counter,
-            getattr(hashlib, self.hash_algorithm)
-        )
+        hmac_obj = self._hmac.copy()
+        hmac_obj.update(_COUNTER.pack(counter))
         hmac_result = hmac_obj.digest()
         
         # 動的切り捨て
         offset = hmac_result[-1] & 0xf
-        code_bytes = hmac_result[offset:offset + 4]
-        code_int = struct.unpack('>I', code_bytes)[0]
+        code_int = _CODE.unpack_from(hmac_result, offset)[0]
         code_int &= 0x7fffffff
-        
-        # 指定桁数に変換
-        code = str(code_int % (10 ** self.digits))
-        return code.zfill(self.digits)
+        return code_int % self.modulus
 
     def verify_totp(self, code: str, timestamp: int = None, window: int = 1) -> bool:
         """
@@ -85,15 +122,694 @@ class TOTPAuthenticator:
         Returns:
             検証結果（True/False）
         """
+        return self._scan(code, self.get_counter(timestamp), window) is not None
+
+    def match_totp(self, code: str, timestamp: int = None, window: int = 1):
+        """
+        TOTPコードを検証し、一致した時間窓のずれを取得
+        
+        一度受理したカウンター値は記憶しておき、同じコードの再利用は拒否する。
+        
+        Args:
+            code: 検証するTOTPコード
+            timestamp: Unix時間（省略時は現在時刻）
+            window: 検証する時間窓の数（前後）
+            
+        Returns:
+            一致したタイムステップのずれ（不一致または再利用の場合はNone）
+        """
+        counter = self.get_counter(timestamp)
+        drift = self._scan(code, counter, window)
+        if drift is None or counter + drift in self._used_counter_set:
+            return None
+
+        if len(self.used_counters) == self.used_counters.maxlen:
+            self._used_counter_set.discard(self.used_counters[0])
+        self.used_counters.append(counter + drift)
+        self._used_counter_set.add(counter + drift)
+        return drift
+
+    def _scan(self, code: str, counter: int, window: int):
+        """時間窓内のカウンター値を走査し、一致したずれを返す"""
+        if not isinstance(code, str) or len(code) != self.digits or not (code.isascii() and code.isdigit()):
+            return None
+
+        # 動的切り捨ての結果は31ビットに収まるため、それを超える値はどの時間窓とも一致しない
+        value = int(code)
+        if value > 0x7fffffff:
+            return None
+
+        # 入力は一度だけ整数に変換し、一致位置によらず全時間窓を定数時間比較する
+        expected = _CODE.pack(value)
+        drift = None
+        for i in range(-window, window + 1):
+            if counter + i < 0:
+                continue
+            matched = hmac.compare_digest(_CODE.pack(self._truncate(counter + i)), expected)
+            if matched and (drift is None or abs(i) < abs(drift)):
+                drift = i
+        return drift
+
+
+class TOTPEngine:
+    def __init__(self):
+        """
+        複数のTOTPオーセンティケーターのコードをまとめて生成するエンジン
+        
+        コードはタイムステップの境界でのみ変わるため、(秘密鍵, カウンター値) をキーに
+        キャッシュし、境界をまたいだときだけHMACを計算し直す。
+        """
+        self.cache = {}
+        self.counters = {}
+
+    def generate(self, authenticator: TOTPAuthenticator, timestamp: float = None) -> str:
+        """
+        1つのオーセンティケーターのTOTPコードをキャッシュから取得（なければ生成）
+        
+        Args:
+            authenticator: TOTPAuthenticator
+            timestamp: Unix時間（省略時は現在時刻）
+            
+        Returns:
+            TOTPコード
+        """
+        secret_key = authenticator.secret_key
+        counter = authenticator.get_counter(timestamp)
+        code = self.cache.get((secret_key, counter))
+        if code is None:
+            code = authenticator.generate_totp_at(counter)
+            self.cache[(secret_key, counter)] = code
+
+            # 古いカウンター値のコードは捨てる
+            previous = self.counters.get(secret_key)
+            if previous is not None and previous != counter:
+                self.cache.pop((secret_key, previous), None)
+            self.counters[secret_key] = counter
+        return code
+
+    def generate_all(self, authenticators: dict, timestamp: float = None) -> dict:
+        """
+        全オーセンティケーターのTOTPコードを生成
+        
+        Args:
+            authenticators: 名前とTOTPAuthenticatorの辞書
+            timestamp: Unix時間（省略時は現在時刻）
+            
+        Returns:
+            名前とTOTPコードの辞書
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        return {name: self.generate(authenticator, timestamp) for name, authenticator in authenticators.items()}
+
+    def next_refresh(self, authenticators: dict, timestamp: float = None) -> float:
+        """
+        次にコードが切り替わるまでの秒数を取得
+        
+        Args:
+            authenticators: 名前とTOTPAuthenticatorの辞書
+            timestamp: Unix時間（省略時は現在時刻）
+            
+        Returns:
+            次のタイムステップ境界までの秒数
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        time_steps = {authenticator.time_step for authenticator in authenticators.values()} or {30}
+        return min(time_step - timestamp % time_step for time_step in time_steps)
+
+
+@functools.lru_cache(maxsize=65536)
+def _cached_authenticator(secret_key: str, digits: int, time_step: int, hash_algorithm: str) -> TOTPAuthenticator:
+    """秘密鍵ごとのTOTPAuthenticatorを（プロセスごとに）使い回す"""
+    return TOTPAuthenticator(secret_key, digits, time_step, hash_algorithm)
+
+
+def _generate_one(secret_key: str, options: tuple, timestamp: int):
+    # 不正な秘密鍵（Base32でない等）が1件あってもバッチ全体を失敗させない
+    try:
+        return _cached_authenticator(secret_key, *options).generate_totp(timestamp)
+    except (ValueError, TypeError):
+        return None
+
+
+def _verify_one(secret_key: str, code: str, options: tuple, timestamp: int, window: int) -> bool:
+    try:
+        return _cached_authenticator(secret_key, *options).verify_totp(code, timestamp, window)
+    except (ValueError, TypeError):
+        return False
+
+
+def _generate_chunk(secret_keys: list, options: tuple, timestamp: int) -> list:
+    return [_generate_one(secret_key, options, timestamp) for secret_key in secret_keys]
+
+
+def _verify_chunk(secret_keys: list, codes: list, options: tuple, timestamp: int, window: int) -> list:
+    return [
+        _verify_one(secret_key, code, options, timestamp, window)
+        for secret_key, code in zip(secret_keys, codes)
+    ]
+
+
+class TOTPBatch:
+    def __init__(self, digits: int = 6, time_step: int = 30, hash_algorithm: str = 'sha1',
+                 workers: int = None, chunk_size: int = 2048, parallel_threshold: int = 8192):
+        """
+        多数の秘密鍵に対してTOTPコードの生成・検証をまとめて行う
+        
+        件数がparallel_threshold以上のときはプロセスプールに分割して実行する。
+        
+        Args:
+            digits: TOTPコードの桁数（デフォルト: 6）
+            time_step: タイムステップ（秒）（デフォルト: 30）
+            hash_algorithm: ハッシュアルゴリズム（デフォルト: sha1）
+            workers: プロセス数（省略時はCPU数）
+            chunk_size: 1プロセスにまとめて渡す件数
+            parallel_threshold: プロセスプールを使う最小件数
+        """
+        if hash_algorithm not in TOTPAuthenticator.HASH_ALGORITHMS:
+            raise ValueError(f"Unsupported hash algorithm: {hash_algorithm}")
+
+        self.options = (digits, time_step, hash_algorithm)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.parallel_threshold = parallel_threshold
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """プロセスプールを終了"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def generate(self, secret_keys, timestamp: int = None) -> list:
+        """
+        TOTPコードをまとめて生成
+        
+        Args:
+            secret_keys: Base32エンコードされた秘密鍵の配列
+            timestamp: Unix時間（省略時は現在時刻）
+            
+        Returns:
+            秘密鍵と同じ順序のTOTPコードのリスト（不正な秘密鍵の位置はNone）
+        """
         if timestamp is None:
             timestamp = int(time.time())
+        secret_keys = list(secret_keys)
+        return self._run(_generate_chunk, len(secret_keys),
+                         lambda s: (secret_keys[s], self.options, timestamp))
+
+    def verify(self, secret_keys, codes, timestamp: int = None, window: int = 1) -> list:
+        """
+        TOTPコードをまとめて検証
+        
+        Args:
+            secret_keys: Base32エンコードされた秘密鍵の配列
+            codes: 検証するTOTPコードの配列
+            timestamp: Unix時間（省略時は現在時刻）
+            window: 検証する時間窓の数（前後）
             
-        for i in range(-window, window + 1):
-            current_timestamp = timestamp + (i * self.time_step)
-            if self.generate_totp(current_timestamp) == code:
-                return True
+        Returns:
+            秘密鍵と同じ順序の検証結果（True/False）のリスト（不正な秘密鍵・コードはFalse）
+        """
+        if timestamp is None:
+            timestamp = int(time.time())
+        secret_keys = list(secret_keys)
+        codes = list(codes)
+        if len(secret_keys) != len(codes):
+            raise ValueError("secret_keys and codes must have the same length")
+        return self._run(_verify_chunk, len(secret_keys),
+                         lambda s: (secret_keys[s], codes[s], self.options, timestamp, window))
+
+    def _run(self, func, count: int, chunk_args) -> list:
+        if count < self.parallel_threshold:
+            return func(*chunk_args(slice(0, count)))
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+
+        futures = [
+            self._executor.submit(func, *chunk_args(slice(start, start + self.chunk_size)))
+            for start in range(0, count, self.chunk_size)
+        ]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+
+def parse_otpauth(data: str):
+    """otpauth URIから名前・秘密鍵・発行者を取り出す（形式が違う場合はNone）"""
+    match = re.match(r"otpauth://totp/(?P<name>[^/?]*)\?secret=(?P<secret>.*)\&issuer=(?P<issuer>.*)", data)
+    if match:
+        return {"name": match.group("name"), "secret": match.group("secret"), "issuer": match.group("issuer")}
+
+
+class VaultLockedError(Exception):
+    pass
+
+
+class Vault:
+    NONCE_SIZE = 16
+    TAG_SIZE = 32
+
+    def __init__(self, connection: sqlite3.Connection):
+        """
+        パスワードから導出した鍵で認証情報を暗号化する金庫
+        
+        鍵はunlock時に一度だけ導出してメモリに保持し、lockで破棄する。
+        各レコードはHMAC-SHA256のカウンターモードで暗号化し、HMAC-SHA256のタグで改ざんを検出する
+        （Encrypt-then-MAC。標準ライブラリのみで実装するため）。
+        """
+        self.connection = connection
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS vault ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), kdf TEXT NOT NULL, salt BLOB NOT NULL, "
+                "params TEXT NOT NULL, verifier BLOB NOT NULL)"
+            )
+        self._enc_hmac = None
+        self._mac_hmac = None
+
+    @property
+    def exists(self) -> bool:
+        return self.connection.execute("SELECT 1 FROM vault").fetchone() is not None
+
+    @property
+    def unlocked(self) -> bool:
+        return self._mac_hmac is not None
+
+    def create(self, password: str):
+        """
+        パスワードを設定して金庫を作成
+        
+        Args:
+            password: 鍵を導出するパスワード
+        """
+        salt = os.urandom(16)
+        if hasattr(hashlib, "scrypt"):
+            kdf, params = "scrypt", {"n": 2 ** 15, "r": 8, "p": 1}
+        else:
+            kdf, params = "pbkdf2_sha256", {"iterations": 600000}
+
+        self._set_key(self._derive(password, kdf, salt, params))
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO vault (id, kdf, salt, params, verifier) VALUES (1, ?, ?, ?, ?)",
+                (kdf, salt, json.dumps(params), self._verifier())
+            )
+
+    def unlock(self, password: str) -> bool:
+        """
+        パスワードから鍵を導出して金庫を開ける
+        
+        Returns:
+            パスワードが正しければTrue
+        """
+        kdf, salt, params, verifier = self.connection.execute(
+            "SELECT kdf, salt, params, verifier FROM vault"
+        ).fetchone()
+        self._set_key(self._derive(password, kdf, salt, json.loads(params)))
+        if hmac.compare_digest(self._verifier(), verifier):
+            return True
+
+        self.lock()
         return False
 
+    def lock(self):
+        """メモリ上の鍵を破棄"""
+        self._enc_hmac = None
+        self._mac_hmac = None
+
+    def encrypt(self, plaintext: str, context: str) -> bytes:
+        """
+        文字列を暗号化
+        
+        Args:
+            plaintext: 暗号化する文字列
+            context: レコードを識別する文字列（別レコードへの付け替えを検出するためタグに含める）
+            
+        Returns:
+            nonce + 暗号文 + タグ
+        """
+        self._check_unlocked()
+        nonce = os.urandom(self.NONCE_SIZE)
+        data = plaintext.encode()
+        ciphertext = self._xor_keystream(nonce, data)
+        return nonce + ciphertext + self._tag(nonce, ciphertext, context)
+
+    def decrypt(self, blob: bytes, context: str) -> str:
+        """
+        暗号化された文字列を復号
+        
+        Args:
+            blob: encryptの戻り値
+            context: 暗号化時と同じレコード識別文字列
+            
+        Returns:
+            復号した文字列
+        """
+        self._check_unlocked()
+        nonce, ciphertext, tag = blob[:self.NONCE_SIZE], blob[self.NONCE_SIZE:-self.TAG_SIZE], blob[-self.TAG_SIZE:]
+        if not hmac.compare_digest(self._tag(nonce, ciphertext, context), tag):
+            raise ValueError("Credential record is corrupted or has been tampered with")
+        return self._xor_keystream(nonce, ciphertext).decode()
+
+    def _check_unlocked(self):
+        if not self.unlocked:
+            raise VaultLockedError("Vault is locked")
+
+    def _derive(self, password: str, kdf: str, salt: bytes, params: dict) -> bytes:
+        if kdf == "scrypt":
+            return hashlib.scrypt(password.encode(), salt=salt, n=params["n"], r=params["r"], p=params["p"],
+                                  maxmem=2 ** 26, dklen=64)
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, params["iterations"], dklen=64)
+
+    def _set_key(self, key: bytes):
+        self._enc_hmac = hmac.new(key[:32], digestmod=hashlib.sha256)
+        self._mac_hmac = hmac.new(key[32:], digestmod=hashlib.sha256)
+
+    def _verifier(self) -> bytes:
+        verifier = self._mac_hmac.copy()
+        verifier.update(b"vault-verifier")
+        return verifier.digest()
+
+    def _xor_keystream(self, nonce: bytes, data: bytes) -> bytes:
+        keystream = bytearray()
+        for block in range(-(-len(data) // 32)):
+            block_hmac = self._enc_hmac.copy()
+            block_hmac.update(nonce + _COUNTER.pack(block))
+            keystream += block_hmac.digest()
+        return (int.from_bytes(data, "big") ^ int.from_bytes(keystream[:len(data)], "big")).to_bytes(len(data), "big")
+
+    def _tag(self, nonce: bytes, ciphertext: bytes, context: str) -> bytes:
+        context = context.encode()
+        tag = self._mac_hmac.copy()
+        tag.update(struct.pack(">I", len(context)) + context + nonce + ciphertext)
+        return tag.digest()
+
+
+class CredentialStore:
+    def __init__(self, path: str = "authenticator.db", legacy_path: str = "authenticator.txt"):
+        """
+        認証情報をアカウント名をキーに保存するストア
+        
+        Args:
+            path: SQLiteデータベースのパス
+            legacy_path: 移行元のテキストファイルのパス（初回のみ取り込む）
+        """
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS credentials ("
+                "name TEXT PRIMARY KEY, secret TEXT NOT NULL, issuer TEXT NOT NULL DEFAULT '', "
+                "uri TEXT NOT NULL DEFAULT '')"
+            )
+
+        self.vault = Vault(self.connection)
+
+        self.legacy_path = legacy_path
+        self.import_legacy()
+
+    def create_vault(self, password: str):
+        """金庫を作成し、平文で保存されている認証情報を暗号化する"""
+        self.vault.create(password)
+        rows = self.connection.execute(
+            "SELECT name, secret, uri FROM credentials WHERE typeof(secret) = 'text'"
+        ).fetchall()
+        with self.connection:
+            for name, secret, uri in rows:
+                self.connection.execute(
+                    "UPDATE credentials SET secret = ?, uri = ? WHERE name = ?",
+                    (self.vault.encrypt(secret, name + "/secret"), self.vault.encrypt(uri, name + "/uri"), name)
+                )
+        # 削除済みページに平文が残らないようにする
+        self.connection.execute("VACUUM")
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM credentials").fetchone()[0]
+
+    def names(self) -> list:
+        """登録順のアカウント名の一覧を取得"""
+        return [name for name, in self.connection.execute("SELECT name FROM credentials ORDER BY rowid")]
+
+    def get(self, name: str):
+        """
+        アカウントの認証情報を取得
+        
+        Returns:
+            name / secret / issuer / uri の辞書（未登録の場合はNone）
+        """
+        row = self.connection.execute(
+            "SELECT name, secret, issuer, uri FROM credentials WHERE name = ?", (name,)
+        ).fetchone()
+        if row:
+            name, secret, issuer, uri = row
+            if isinstance(secret, bytes):
+                secret = self.vault.decrypt(secret, name + "/secret")
+                uri = self.vault.decrypt(uri, name + "/uri")
+            return {"name": name, "secret": secret, "issuer": issuer, "uri": uri}
+
+    def put(self, name: str, secret: str, issuer: str = "", uri: str = ""):
+        """認証情報を登録（同じ名前があれば上書き、金庫があれば暗号化して保存）"""
+        if self.vault.exists:
+            secret = self.vault.encrypt(secret, name + "/secret")
+            uri = self.vault.encrypt(uri, name + "/uri")
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO credentials (name, secret, issuer, uri) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET secret = excluded.secret, issuer = excluded.issuer, uri = excluded.uri",
+                (name, secret, issuer, uri)
+            )
+
+    def delete(self, name: str):
+        """認証情報を削除"""
+        with self.connection:
+            self.connection.execute("DELETE FROM credentials WHERE name = ?", (name,))
+
+    def import_legacy(self):
+        """テキストファイルをまだ取り込んでいなければ取り込む（取り込み済みかはuser_versionに記録）"""
+        version, = self.connection.execute("PRAGMA user_version").fetchone()
+        if version >= 1:
+            return
+        # 金庫がある場合は暗号化して保存するため、開くまで取り込みを待つ
+        if self.vault.exists and not self.vault.unlocked:
+            return
+
+        # 記録を始める前のデータベースは、中身があれば取り込み済みとみなす
+        if os.path.isfile(self.legacy_path) and len(self) == 0:
+            self.migrate(self.legacy_path)
+        self.connection.execute("PRAGMA user_version = 1")
+
+    def migrate(self, legacy_path: str):
+        """テキストファイル（1行1つのotpauth URI）から取り込む"""
+        with open(legacy_path, "r") as f:
+            for line in f:
+                result = parse_otpauth(line.strip())
+                if result:
+                    self.put(result["name"], result["secret"], result["issuer"], line.strip())
+
+    def close(self):
+        self.connection.close()
+
+
+class AuthenticatorRegistry(collections.abc.Mapping):
+    def __init__(self, store: CredentialStore):
+        """
+        アカウント名とTOTPAuthenticatorの辞書
+        
+        起動時は名前の一覧だけを読み込み、TOTPAuthenticatorは初めて参照されたときに作る。
+        """
+        self.store = store
+        self._names = store.names()
+        self._loaded = {}
+
+    def __getitem__(self, name: str) -> TOTPAuthenticator:
+        authenticator = self._loaded.get(name)
+        if authenticator is None:
+            credential = self.store.get(name)
+            if credential is None:
+                raise KeyError(name)
+            authenticator = self._loaded[name] = TOTPAuthenticator(credential["secret"])
+        return authenticator
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name) -> bool:
+        return name in self._loaded or name in self._names
+
+    def loaded(self) -> dict:
+        """読み込み済みのTOTPAuthenticatorの辞書"""
+        return dict(self._loaded)
+
+    def unload(self):
+        """読み込み済みのTOTPAuthenticator（復号済みの秘密鍵）を破棄"""
+        self._loaded.clear()
+
+    def reload(self):
+        """ストアから名前の一覧を読み直す"""
+        self._names = self.store.names()
+
+    def add(self, name: str, secret: str, issuer: str = "", uri: str = ""):
+        self.store.put(name, secret, issuer, uri)
+        self._loaded.pop(name, None)
+        if name not in self._names:
+            self._names.append(name)
+
+    def remove(self, name: str):
+        self.store.delete(name)
+        self._loaded.pop(name, None)
+        self._names.remove(name)
+
+
+class QrDecoder:
+    def __init__(self, max_size: int = 2048, strip_rows: int = 256) -> None:
+        """
+        QRコードのデコーダー
+        
+        QReaderの検出モデルは読み込みが重いため一度だけ読み込み、
+        デコードはワーカースレッドで実行してUIを止めないようにする。
+        画像は縮小・グレースケール化し、軽いデコーダーで読めなかったときだけモデルを使う。
+        
+        Args:
+            max_size: 縮小後の長辺の最大ピクセル数
+            strip_rows: RGB配列へ書き込むときに一度に変換する行数
+        """
+        self.max_size = max_size
+        self.strip_rows = strip_rows
+        self.timings = {}
+        # 直近のスキャン中にtracemallocで計測したピークのバイト数
+        # （NumPyの配列は含むが、PILの画像とモデルのネイティブライブラリが確保したメモリは含まない）
+        self.peak_bytes = 0
+        self._qreader = None
+        self._fast_detector = None
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="qrdecoder")
+
+    def warm_up(self) -> concurrent.futures.Future:
+        """バックグラウンドでモデルを読み込む"""
+        return self._executor.submit(self._load)
+
+    def decode(self, image) -> concurrent.futures.Future:
+        """
+        画像のQRコードをワーカースレッドでデコード
+        
+        Args:
+            image: PILの画像
+            
+        Returns:
+            デコード結果（文字列のタプル）を返すFuture
+        """
+        return self._executor.submit(self._decode, image)
+
+    def shutdown(self):
+        """
+        待機中のデコードを取り消してワーカーを終了
+        
+        実行中のモデル読み込み・デコードは中断できないため、インタープリタの終了時にその完了を待つ。
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _load(self):
+        with self._lock:
+            if self._qreader is None:
+                from qreader import QReader
+                self._qreader = QReader()
+
+                try:
+                    import cv2
+                    self._fast_detector = cv2.QRCodeDetector()
+                except ImportError:
+                    self._fast_detector = None
+            return self._qreader
+
+    def _decode(self, image) -> tuple:
+        qreader = self._load()
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        timings = {}
+        try:
+            return self._decode_image(qreader, image, timings)
+        finally:
+            self.timings = timings
+            self.peak_bytes = tracemalloc.get_traced_memory()[1] - baseline
+            if started:
+                tracemalloc.stop()
+
+    def _decode_image(self, qreader, image, timings: dict) -> tuple:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+
+        # 元画像（クリップボードの画像）は複製せず、縮小してから配列にする
+        start = time.perf_counter()
+        factor = -(-max(image.size) // self.max_size)
+        small = image.reduce(factor) if factor > 1 else image
+        timings["downsample"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        gray = np.asarray(small.convert("L"))
+        timings["grayscale"] = time.perf_counter() - start
+
+        if self._fast_detector is not None:
+            start = time.perf_counter()
+            qrdata = self._fast_decode(gray, image, factor)
+            timings["fast_path"] = time.perf_counter() - start
+            if qrdata:
+                return qrdata
+
+        start = time.perf_counter()
+        rgb = self._to_rgb_array(small)
+        timings["rgb"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        qrdata = tuple(data for data in qreader.detect_and_decode(rgb) if data)
+        timings["model"] = time.perf_counter() - start
+        return qrdata
+
+    def _to_rgb_array(self, image) -> np.ndarray:
+        """画像を連続したRGB配列に変換（全体の一時コピーを作らず、数行ずつ直接書き込む）"""
+        width, height = image.size
+        array = np.empty((height, width, 3), dtype=np.uint8)
+        buffer = memoryview(array).cast("B")
+        row_bytes = width * 3
+        for top in range(0, height, self.strip_rows):
+            bottom = min(top + self.strip_rows, height)
+            strip = image if (top, bottom) == (0, height) else image.crop((0, top, width, bottom))
+            buffer[top * row_bytes:bottom * row_bytes] = strip.tobytes("raw", "RGB")
+        return array
+
+    def _fast_decode(self, gray, image, factor: int) -> tuple:
+        data, points, _ = self._fast_detector.detectAndDecode(gray)
+        if data:
+            return (data,)
+        if points is None or factor == 1:
+            return ()
+
+        # 縮小画像で位置だけ分かった場合は、その周辺を元の解像度で切り出して読み直す
+        x1, y1 = points.reshape(-1, 2).min(axis=0) * factor
+        x2, y2 = points.reshape(-1, 2).max(axis=0) * factor
+        margin = max(x2 - x1, y2 - y1) * 0.2
+        box = tuple(int(v) for v in (x1 - margin, y1 - margin, x2 + margin, y2 + margin))
+        roi = np.asarray(image.crop(box).convert("L"))
+        data, _, _ = self._fast_detector.detectAndDecode(roi)
+        return (data,) if data else ()
+
 
 class QrCodeReader:
     def __init__(self, master) -> None:
@@ -106,18 +822,90 @@ class QrCodeReader:
         self.qr_read_button.image = qr_img
         self.qr_read_button.grid(column=0, row=0, padx=10, pady=10)
 
+        self.decoder = QrDecoder()
+        self.decoder.warm_up()
+        self.pending = None
+
+    def close(self):
+        self.decoder.shutdown()
+
     def qr_read(self, event=None):
+        if self.pending is not None:
+            return
+
         clipboard_img = ImageGrab.grabclipboard()
-        if clipboard_img:
-            pilimg = np.array(clipboard_img, dtype=np.uint8)
+        if isinstance(clipboard_img, Image.Image):
+            self.pending = self.decoder.decode(clipboard_img)
+            self.qr_read_button.configure(state="disabled")
+            self.frame.after(50, self.qr_read_done)
+
+    def qr_read_done(self):
+        # Tkはメインスレッドからしか触れないため、デコード完了をポーリングで待つ
+        if not self.pending.done():
+            self.frame.after(50, self.qr_read_done)
+            return
+
+        future, self.pending = self.pending, None
+        self.qr_read_button.configure(state="normal")
+
+        error = future.exception()
+        if error is not None:
+            messagebox.showerror("Authenticator", f"QRコードを読み取れませんでした\n{type(error).__name__}: {error}")
+            return
+
+        qrdata = future.result()
+        if len(qrdata) > 0:
+            global _qrdata
+            _qrdata = qrdata[0]
+            root.event_generate("<<qrread>>")
+
+
+class OTPListView:
+    def __init__(self, listbox: tkinter.Listbox, render_row) -> None:
+        self.listbox = listbox
+        self.render_row = render_row
+        self.names = []
+        self.texts = []
+        self.dirty = set()
+
+    def set_names(self, names):
+        names = list(names)
+        for i, name in enumerate(names):
+            if i >= len(self.names):
+                self.listbox.insert("end", name)
+                self.texts.append(name)
+            elif self.names[i] != name:
+                self.replace_row(i, name)
 
-            qreader = QReader()
+        if len(self.names) > len(names):
+            self.listbox.delete(len(names), "end")
+            del self.texts[len(names):]
 
-            qrdata = qreader.detect_and_decode(pilimg[..., :3])
-            if len(qrdata) > 0:
-                global _qrdata
-                _qrdata = qrdata[0]
-                root.event_generate("<<qrread>>")
+        self.names = names
+        self.invalidate()
+
+    def invalidate(self):
+        self.dirty = set(range(len(self.names)))
+        self.render_visible()
+
+    def render_visible(self):
+        # 画面に見えている行だけを描き直し、残りはスクロールで見えたときに描く
+        if not self.dirty:
+            return
+
+        first = max(self.listbox.nearest(0), 0)
+        last = min(self.listbox.nearest(self.listbox.winfo_height()), len(self.names) - 1)
+        for i in range(first, last + 1):
+            if i in self.dirty:
+                self.dirty.discard(i)
+                text = self.render_row(self.names[i])
+                if text != self.texts[i]:
+                    self.replace_row(i, text)
+
+    def replace_row(self, index: int, text: str):
+        self.listbox.delete(index)
+        self.listbox.insert(index, text)
+        self.texts[index] = text
 
 
 class OTPPreviewer:
@@ -133,80 +921,133 @@ class OTPPreviewer:
                                            mode="determinate", variable=self.progressbar_var)
         self.progressbar.grid(column=0, row=0, columnspan=2, padx=20, pady=10, sticky="ew")
 
-        scrollbar = tkinter.Scrollbar(self.frame)
-        scrollbar.grid(column=1, row=1, sticky="ns")
-        self.otp_list = tkinter.StringVar(self.frame)
-        self.otp_listbox = tkinter.Listbox(self.frame, listvariable=self.otp_list, width=40, font=("メイリオ", 11),
-                                           yscrollcommand=scrollbar.set, activestyle="none")
-        scrollbar["command"] = self.otp_listbox.yview
+        self.scrollbar = tkinter.Scrollbar(self.frame)
+        self.scrollbar.grid(column=1, row=1, sticky="ns")
+        self.otp_listbox = tkinter.Listbox(self.frame, width=40, font=("メイリオ", 11),
+                                           yscrollcommand=self.listbox_scroll, activestyle="none")
+        self.scrollbar["command"] = self.otp_listbox.yview
         self.otp_listbox.grid(column=0, row=1, padx=20, pady=10, sticky="ew")        
+        self.otp_view = OTPListView(self.otp_listbox, self.format_row)
 
         root.bind("<<qrread>>", self.add_qrdata)
         root.bind("<<ListboxSelect>>", self.listbox_select)
+        self.otp_listbox.bind("<Delete>", self.delete_selected)
+        root.bind("<Control-l>", self.lock)
 
-        self.authenticators = {}
+        self.store = CredentialStore()
+        self.authenticators = AuthenticatorRegistry(self.store)
+        self.totp_engine = TOTPEngine()
+        self.unlock()
 
-        self.add_filedata()
+        self.otp_view.set_names(self.authenticators)
         self.create_totp()
+        self.update_progressbar()
+
+    def unlock(self, event=None):
+        vault = self.store.vault
+        while not vault.unlocked:
+            if not vault.exists:
+                password = simpledialog.askstring("Authenticator", "金庫のパスワードを設定してください", show="*")
+                if password is None:
+                    break
+                if password:
+                    self.store.create_vault(password)
+                    self.remove_legacy_file()
+            else:
+                password = simpledialog.askstring("Authenticator", "パスワードを入力してください", show="*")
+                if password is None:
+                    break
+                if not vault.unlock(password):
+                    messagebox.showerror("Authenticator", "パスワードが違います")
+
+        if vault.unlocked:
+            self.store.import_legacy()
+            self.authenticators.reload()
+            self.otp_view.set_names(self.authenticators)
+
+    def lock(self, event=None):
+        self.store.vault.lock()
+        self.authenticators.unload()
+        self.totp_engine = TOTPEngine()
+        self.otp_view.invalidate()
+        self.unlock()
+
+    def remove_legacy_file(self):
+        if os.path.isfile("authenticator.txt") and messagebox.askyesno(
+                "Authenticator", "平文の authenticator.txt を削除しますか？"):
+            os.remove("authenticator.txt")
+
+    def listbox_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.otp_view.render_visible()
 
     def listbox_select(self, event=None):
         match = re.match(r".*：(?P<otp>\d{6})", self.otp_listbox.get(tkinter.ACTIVE))
         if match:
             root.clipboard_append(match.group("otp"))
 
-    def add_filedata(self):
-        for line in self.read_file():
-            result = self.validate(line)
-            if result:
-                self.add_authenticator(result["name"], result["secret"])
+    def delete_selected(self, event=None):
+        selection = self.otp_listbox.curselection()
+        if not selection:
+            return
+
+        name = self.otp_view.names[selection[0]]
+        if messagebox.askyesno("Authenticator", f"{name} を削除しますか？"):
+            self.authenticators.remove(name)
+            self.otp_view.set_names(self.authenticators)
 
     def add_qrdata(self, event=None):
         result = self.validate(_qrdata)
-        if result:
-            self.add_authenticator(result["name"], result["secret"])
-            self.write_file(_qrdata)
+        if not result:
+            return
+
+        if not self.store.vault.unlocked and self.store.vault.exists:
+            self.unlock()
+        try:
+            self.authenticators.add(result["name"], result["secret"], result["issuer"], _qrdata)
+        except VaultLockedError:
+            messagebox.showerror("Authenticator", "金庫がロックされているため登録できませんでした")
+            return
+        self.otp_view.set_names(self.authenticators)
 
     def validate(self, data):
-        match = re.match(r"otpauth://totp/(?P<name>[^/?]*)\?secret=(?P<secret>.*)\&issuer=(?P<issuer>.*)", data)
-        if match:
-            return {"name": match.group("name"), "secret": match.group("secret"), "issuer": match.group("issuer")}
-        
-    def add_authenticator(self, name, secret):
-        self.authenticators[name] = TOTPAuthenticator(secret)
+        return parse_otpauth(data)
 
     def create_totp(self):
-        tmp = []
-        for name in self.authenticators.keys():
-            tmp.append(f"{name}：{self.authenticators[name].generate_totp()}")
-        
-        self.otp_list.set(" ".join(tmp))
+        self.otp_view.invalidate()
 
-        self.progressbar_var.set(time.time() % 30)
-        root.after(100, self.create_totp)
+        # 次のタイムステップ境界で更新する
+        wait = self.totp_engine.next_refresh(self.authenticators.loaded())
+        root.after(int(wait * 1000) + 1, self.create_totp)
 
-    def write_file(self, data):
-        with open("authenticator.txt", "a", newline="") as f:
-            f.write("\r\n" + data)
+    def format_row(self, name):
+        try:
+            return f"{name}：{self.totp_engine.generate(self.authenticators[name])}"
+        except VaultLockedError:
+            return f"{name}：******"
 
-    def read_file(self):
-        if os.path.isfile("authenticator.txt"):
-            with open("authenticator.txt", "r") as f:
-                return f.readlines()
+    def update_progressbar(self):
+        self.progressbar_var.set(time.time() % 30)
+        root.after(100, self.update_progressbar)
 
-        return []
 
+if __name__ == "__main__":
+    root = tkinter.Tk()
+    root.geometry("300x500")
+    root.title("Authenticator")
+    root.anchor("center")
 
-root = tkinter.Tk()
-root.geometry("300x500")
-root.title("Authenticator")
-root.anchor("center")
+    root.grid_columnconfigure(index=0, weight=1)
+    root.grid_rowconfigure(index=[0, 1], weight=1)
 
-root.grid_columnconfigure(index=0, weight=1)
-root.grid_rowconfigure(index=[0, 1], weight=1)
+    qrcodereader = QrCodeReader(root)
+    otppreviwer = OTPPreviewer(root)
 
-qrcodereader = QrCodeReader(root)
-otppreviwer = OTPPreviewer(root)
+    _qrdata = ""
 
-_qrdata = ""
+    def on_close():
+        qrcodereader.close()
+        root.destroy()
 
-root.mainloop()
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    root.mainloop()